@@ -2,12 +2,11 @@ import uuid
 from typing import List
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Path
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from core.state import app_state
 from core.lifespan import lifespan
 from models.schemas import (QueryRequest, QueryResponse, SourceCreate, SourceState)
-from core.query import execute_query
-from rag.loader import ingest_webpage
+from core.query import execute_query, execute_query_stream
 
 load_dotenv()
 
@@ -15,31 +14,28 @@ app = FastAPI(lifespan=lifespan)
 
 
 # API Endpoints
-@app.get("/sources", response_model=List[str])
+@app.get("/sources", response_model=List[SourceState])
 async def list_sources():
     """List all sources and their status"""
-    print("DEBUG", "get", app_state.sources)
-    return app_state.sources
+    return list(app_state.sources.values())
 
 
-@app.post("/sources", response_model=SourceState)
+@app.post("/sources", response_model=SourceState, status_code=202)
 async def add_source(source: SourceCreate):
-    """Add a new URL to the vector store"""
-    result = await ingest_webpage(str(source.url), source.description)
-    
-    if result.status == "failed":
-        return JSONResponse(
-            status_code=500,
-            content={
-                "id": getattr(result, "id", None),
-                "url": str(result.url),
-                "status": "failed",
-                "error": "Failed to process source"
-            }
-        )
-    
-    app_state.sources.append(str(result.url))
-    return result
+    """Queue a new URL for ingestion into the vector store. Poll /sources/{source_id} for its status"""
+    source_id = str(uuid.uuid4())
+    job = SourceState(id=source_id, url=source.url, status="pending")
+    app_state.sources[source_id] = job
+    await app_state.ingest_queue.put((source_id, str(source.url), source.description))
+    return job
+
+
+@app.get("/sources/{source_id}", response_model=SourceState)
+async def get_source(source_id: str = Path(..., description="The ID of the source to check")):
+    """Get the ingestion status of a source"""
+    if source_id not in app_state.sources:
+        raise HTTPException(status_code=404, detail="Source not found")
+    return app_state.sources[source_id]
 
 @app.delete("/sources/{source_id}")
 async def delete_source(source_id: str = Path(..., description="The ID of the source to delete")):
@@ -55,7 +51,9 @@ async def delete_source(source_id: str = Path(..., description="The ID of the so
     # 3. Rebuild the vector store excluding the deleted source
     
     # For this example, we'll just remove from our sources list
-    del app_state.sources[source_id]
+    source = app_state.sources.pop(source_id)
+    if source.status == "processed":
+        app_state.answer_cache.clear() # cached answers may cite this source
     
     return {"status": "deleted", "id": source_id}
 
@@ -63,4 +61,10 @@ async def delete_source(source_id: str = Path(..., description="The ID of the so
 @app.post("/query", response_model=QueryResponse)
 async def query_sources(query_request: QueryRequest):
     """Query the sources and generate an answer"""
-    return execute_query(query_request.query)
\ No newline at end of file
+    return await execute_query(query_request.query)
+
+
+@app.post("/query/stream")
+async def query_sources_stream(query_request: QueryRequest):
+    """Query the sources and stream the answer as server-sent events"""
+    return StreamingResponse(await execute_query_stream(query_request.query), media_type="text/event-stream")
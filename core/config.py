@@ -9,6 +9,15 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_HOST_URL = os.getenv("PINECONE_HOST_URL")
 PINECONE_INDEX_NAME = "rag-1"  # Choose a name for your index
+PINECONE_NAMESPACE = "dev"
+PINECONE_POOL_THREADS = 30  # Parallel upsert requests (async_req)
+
+# Vector store backend: "pinecone", or "numpy" for the in-memory NPVectorStore
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+QUANTIZE_EMBEDDINGS = True  # numpy backend: store vectors as int8 with a per-row scale
+HALF_PRECISION_EMBEDDINGS = False  # numpy backend, without quantization: store vectors as float16
+VECTOR_STORE_PATH = "vectorstore"  # numpy backend: saved on shutdown, loaded on startup
+SCRAPE_CACHE_PATH = "scrape_cache.json"  # content hashes of ingested pages: saved on shutdown, loaded on startup
 
 # Model configurations
 # EMBEDDING_MODEL = "text-embedding-3-small"  # Cost-effective, good performance # 1536
@@ -17,4 +26,34 @@ EMBEDDING_MODEL = "text-embedding-3-large"  # 3072
 LLM_MODEL = "gpt-3.5-turbo"  # Good balance of quality and cost
 
 # Vector dimensions for OpenAI embedding models
-EMBEDDING_DIMENSION = 3072  # Dimension for text-embedding-3-small
\ No newline at end of file
+EMBEDDING_DIMENSION = 3072  # Dimension for text-embedding-3-small
+
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "16"))  # Embeddings requests in flight at once (lower it to stay under the rate limit)
+EMBEDDING_BATCH_TOKENS = 20000  # Token budget of a single embeddings request
+
+QUERY_EMBEDDING_CACHE_SIZE = 4096  # Recent query embeddings kept in memory (LRU)
+ANSWER_CACHE_SIZE = 1024  # Recent answers reused for near-duplicate queries (FIFO)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Min cosine similarity between queries to reuse an answer
+ANSWER_CACHE_TTL = 900  # Seconds a cached answer stays reusable
+
+# Retrieval configurations
+CONTEXT_DOCS = 5  # Docs passed to the LLM as context
+RERANK_CANDIDATES = 20  # Docs retrieved for the reranker to choose from
+MMR_FETCH_K = 30  # Candidates MMR picks a diverse subset from
+MMR_LAMBDA = 0.5  # 1 = pure similarity, 0 = pure diversity
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "")  # Cross-encoder, e.g. "BAAI/bge-reranker-v2-m3"; empty disables reranking
+RERANK_CACHE_TTL = 900  # Seconds a cached (query, document) score stays reusable
+
+SAVE_GRAPH_PNG = os.getenv("SAVE_GRAPH_PNG", "false").lower() == "true"  # Render the compiled graph to agent_graph.png at startup
+
+# Chunking configurations (in tokens)
+CHUNK_SIZE = 512  # fewer, larger chunks: fewer embeddings and vectors to upsert
+CHUNK_OVERLAP = 64
+
+# Ingestion configurations
+INGEST_WORKERS = 4  # Background tasks consuming the /sources ingestion queue
+INGEST_CONCURRENCY = 5  # Max pages fetched at once by one bulk ingestion
+# Chunks embedded per slice; a slice is upserted while the next one is embedded. Two full rounds of
+# EMBEDDING_CONCURRENCY requests, so every request slot stays busy until the slice's last batches
+INGEST_PIPELINE_CHUNKS = 2 * EMBEDDING_CONCURRENCY * (EMBEDDING_BATCH_TOKENS // CHUNK_SIZE)
+SCRAPER_WARM_BROWSER = os.getenv("SCRAPER_WARM_BROWSER", "false").lower() == "true"  # Launch Chromium and its context pool at startup instead of on the first render
@@ -1,18 +1,46 @@
+import asyncio
+import logging
+import uuid
+import aiohttp
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from core.state import app_state
 from rag.graph import create_rag_graph
-from rag.vectorstore import get_vector_store
+from rag.vectorstore import (
+    get_vector_store,
+    get_embeddings_model,
+    count_vectors,
+    init_pinecone_client,
+    init_pinecone_index
+)
+from rag.np_vectorstore import NPVectorStore
 from langchain.tools.retriever import create_retriever_tool
-from rag.loader import ingest_webpage
+from rag.loader import bulk_ingest, ingest_worker
 from langchain.chat_models import init_chat_model
-from langchain_openai import OpenAIEmbeddings
 from rag.scraper import WebScraperAgent
+from rag.semantic_cache import SemanticCache
+from rag.reranker import Reranker
 from core.config import (
     PINECONE_INDEX_NAME,
-    EMBEDDING_MODEL
+    EMBEDDING_MODEL,
+    INGEST_WORKERS,
+    VECTOR_STORE,
+    VECTOR_STORE_PATH,
+    SCRAPE_CACHE_PATH,
+    EMBEDDING_DIMENSION,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+    RERANKER_MODEL,
+    RERANK_CACHE_TTL,
+    SCRAPER_WARM_BROWSER,
+    CONTEXT_DOCS,
+    MMR_FETCH_K,
+    MMR_LAMBDA
 )
 
+logger = logging.getLogger(__name__)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -21,12 +49,25 @@ async def lifespan(app: FastAPI):
     """
 
     # Init Scraper
-    app_state.embeddings = OpenAIEmbeddings()
-    app_state.scraper = WebScraperAgent() # browser automation with playwright
+    # Same model as the index dimension: ingestion embeds with it directly, retrieval through the vector store
+    app_state.embeddings = get_embeddings_model(EMBEDDING_MODEL)
+    # One HTTP session for the app lifetime: pooled keep-alive connections across page fetches
+    app_state.http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300)
+    )
+    app_state.scraper = WebScraperAgent(http=app_state.http) # browser automation with playwright
+    if SCRAPER_WARM_BROWSER:
+        await app_state.scraper.init_browser() # pay Chromium's cold start once, not on the first request
     app_state.llm = init_chat_model("openai:gpt-4.1", temperature=0)
 
-    # Initialize vector store
-    app_state.vectorstore = get_vector_store(PINECONE_INDEX_NAME, EMBEDDING_MODEL)
+    # Initialize vector store. The Pinecone client and index are built once and reused by every call
+    if VECTOR_STORE == "pinecone":
+        app_state.pinecone = init_pinecone_client()
+        app_state.pc_index = init_pinecone_index(app_state.pinecone, PINECONE_INDEX_NAME)
+    app_state.vectorstore = get_vector_store(app_state.embeddings, app_state.pc_index)
+    # Only trust the cache while the store still holds what it describes
+    if count_vectors(app_state.vectorstore) > 0:
+        app_state.scrape_cache.load(SCRAPE_CACHE_PATH)
     
     # Ingest default sources
     default_sources = [
@@ -37,17 +78,20 @@ async def lifespan(app: FastAPI):
         # ("https://lilianweng.github.io/posts/2023-06-23-agent/", "page 4"),
     ]
     
-    for url, description in default_sources:
-        try:
-            await ingest_webpage(url)
-            app_state.sources.append(url)
-        except Exception as e:
-            print(f"Error adding default sources: {e}")
+    # Ingest default sources as one batch: pages are fetched concurrently and embedded in a single request.
+    # A failing source is logged and skipped without aborting the others.
+    # Pages already ingested by a previous run are only fetched: the scrape cache finds them unchanged.
+    results = await bulk_ingest(default_sources)
+    for (url, _), result in zip(default_sources, results):
+        source_id = str(uuid.uuid4())
+        app_state.sources[source_id] = result.model_copy(update={"id": source_id})
+        if result.status == "failed":
+            logger.error("Error adding default source %s", url)
     
     # Set up tool for AI agents
     app_state.retriever = app_state.vectorstore.as_retriever(
-        search_type="similarity_score_threshold",
-        search_kwargs={"k": 1, "score_threshold": 0.3},
+        search_type="mmr",
+        search_kwargs={"k": CONTEXT_DOCS, "fetch_k": MMR_FETCH_K, "lambda_mult": MMR_LAMBDA},
     )
     app_state.retriever_tool = create_retriever_tool(
         app_state.retriever,
@@ -56,8 +100,26 @@ async def lifespan(app: FastAPI):
     )
     
     # Setup the RAG agent
-    app_state.graph = create_rag_graph(app_state.llm, app_state.retriever_tool)
+    app_state.answer_cache = SemanticCache(
+        EMBEDDING_DIMENSION, threshold=ANSWER_CACHE_THRESHOLD, max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL
+    )
+    if RERANKER_MODEL:
+        app_state.reranker = Reranker(RERANKER_MODEL, ttl=RERANK_CACHE_TTL)
+    app_state.graph = create_rag_graph(app_state.llm, app_state.vectorstore, app_state.reranker)
+
+    # Sources added through the API are ingested in the background
+    app_state.ingest_queue = asyncio.Queue()
+    app_state.ingest_workers = [asyncio.create_task(ingest_worker()) for _ in range(INGEST_WORKERS)]
 
     # Above code runs on startup
     yield
-    # Below code runs on shutdown (currently empty)
+    # Below code runs on shutdown
+    await app_state.ingest_queue.join()
+    for worker in app_state.ingest_workers:
+        worker.cancel()
+    await asyncio.gather(*app_state.ingest_workers, return_exceptions=True)
+    if isinstance(app_state.vectorstore, NPVectorStore):
+        app_state.vectorstore.save(VECTOR_STORE_PATH)
+    app_state.scrape_cache.save(SCRAPE_CACHE_PATH)
+    await app_state.scraper.close()
+    await app_state.http.close()
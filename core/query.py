@@ -1,9 +1,30 @@
+import json
+import logging
+from typing import AsyncIterator, List
 from fastapi import HTTPException
 from models.schemas import QueryResponse, GraphState
 from core.state import app_state
 
+logger = logging.getLogger(__name__)
 
-def execute_query(query_text):
+
+def _source_urls(context) -> List[str]:
+    """Unique source URLs of the context documents, in first-seen order."""
+    sources = list(dict.fromkeys(
+        doc.metadata["source"]
+        for doc in context or []
+        if doc.metadata and "source" in doc.metadata
+    ))
+    return sources if sources else ['No sources found']
+
+
+def _sse(data: dict, event: str = None) -> bytes:
+    """One server-sent event frame."""
+    frame = b"data: " + json.dumps(data).encode() + b"\n\n"
+    return f"event: {event}\n".encode() + frame if event else frame
+
+
+async def execute_query(query_text):
     """Process a user query and generate an answer using the RAG graph.
     
     Args:
@@ -13,18 +34,29 @@ def execute_query(query_text):
         QueryResponse object with the query, answer, and source URLs
         
     Raises:
-        HTTPException: If no sources have been added or if the query fails
+        HTTPException: If the graph is not initialized, no sources have been added or the query fails
     """
-    # if not app_state.sources:
+    # if not app_state.processed_urls:
     #     raise HTTPException(status_code=400, detail="No sources have been added yet")
     
+    # The graph is compiled once at startup and never rebuilt per query
+    if app_state.graph is None:
+        raise HTTPException(status_code=503, detail="RAG graph is not initialized")
+
+    # Near-duplicate of a recent query: answer from the cache without running the graph.
+    # The query embedding is cached too, so retrieval does not embed the query again on a miss
+    query_embedding = await app_state.embeddings.aembed_query(query_text)
+    cached = app_state.answer_cache.lookup(query_embedding)
+    if cached is not None:
+        return cached.model_copy(update={"query": query_text})
+
     # Run the query through the graph
     initial_state = GraphState(
         question=query_text
     )
     
-    # Run the query
-    final_state = app_state.graph.invoke(initial_state)
+    # Run the query without blocking the event loop
+    final_state = await app_state.graph.ainvoke(initial_state)
     
     # Extract the answer and sources from the final state
     if final_state and "answer" in final_state:
@@ -33,19 +65,69 @@ def execute_query(query_text):
         # Extract content from the message
         answer = agent_answer.content if hasattr(agent_answer, "content") else str(agent_answer)
         
-        # Extract unique source URLs from context documents' metadata
-        sources = []
-        if final_state.get("context"):
-            for doc in final_state["context"]:
-                if doc.metadata and "source" in doc.metadata:
-                    source = doc.metadata["source"]
-                    if source not in sources:
-                        sources.append(source)
-        
-        return QueryResponse(
+        # Fields are assembled server-side from known types: skip validation
+        response = QueryResponse.model_construct(
             query=query_text,
             answer=answer,
-            sources=sources if sources else ['No sources found']
+            sources=_source_urls(final_state.get("context"))
         )
+        app_state.answer_cache.add(query_embedding, response)
+        return response
     else:
-        raise HTTPException(status_code=500, detail="Failed to generate response") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to generate response")
+
+
+async def execute_query_stream(query_text) -> AsyncIterator[bytes]:
+    """Like execute_query, but stream the answer as server-sent events while it is generated.
+
+    The query is embedded and looked up in the answer cache before the stream starts, so their
+    failures are still plain HTTP errors rather than a broken stream.
+
+    Returns:
+        An async iterator of `data: {"delta": ...}` frames with answer tokens, then one `event: done`
+        frame holding the full QueryResponse (or an `event: error` frame if generation fails).
+
+    Raises:
+        HTTPException: If the graph is not initialized
+    """
+    if app_state.graph is None:
+        raise HTTPException(status_code=503, detail="RAG graph is not initialized")
+
+    query_embedding = await app_state.embeddings.aembed_query(query_text)
+    cached = app_state.answer_cache.lookup(query_embedding)
+    if cached is not None:
+        return _stream_cached(cached.model_copy(update={"query": query_text}))
+    return _stream_answer(query_text, query_embedding)
+
+
+async def _stream_cached(response: QueryResponse) -> AsyncIterator[bytes]:
+    """A cached answer, as a single delta."""
+    yield _sse({"delta": response.answer})
+    yield _sse(response.model_dump(), event="done")
+
+
+async def _stream_answer(query_text, query_embedding: List[float]) -> AsyncIterator[bytes]:
+    """Run the graph, streaming the tokens of the generate node, and cache the full answer."""
+    context, answer = [], []
+    try:
+        async for ev in app_state.graph.astream_events(GraphState(question=query_text), version="v2"):
+            node = ev.get("metadata", {}).get("langgraph_node")
+            if ev["event"] == "on_chat_model_stream" and node == "generate":
+                delta = ev["data"]["chunk"].content
+                if delta:
+                    answer.append(delta)
+                    yield _sse({"delta": delta})
+            elif ev["event"] == "on_chain_end" and ev["name"] == "retrieve":
+                context = ev["data"]["output"].get("context") or []
+    except Exception:
+        logger.exception("Failed to stream response")
+        yield _sse({"detail": "Failed to generate response"}, event="error")
+        return
+
+    response = QueryResponse.model_construct(
+        query=query_text,
+        answer="".join(answer),
+        sources=_source_urls(context)
+    )
+    app_state.answer_cache.add(query_embedding, response)
+    yield _sse(response.model_dump(), event="done")
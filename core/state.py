@@ -1,16 +1,33 @@
+from models.schemas import SourceState
+from rag.cache import ScrapeCache
+
+
 class AppState:
     """Manages the application state and resources."""
     
     def __init__(self):
-        self.sources: str = []
+        self.sources: dict[str, SourceState] = {} # source id -> SourceState
+        self.scrape_cache = ScrapeCache() # content hash of each ingested url, to skip unchanged pages
+        self.ingest_queue = None # (source id, url, description) waiting to be ingested
+        self.ingest_workers = []
         self.retriever = None # doc retrieval logic (engage with vector store)
         self.retriever_tool = None # make available to AI agents
+        self.reranker = None # cross-encoder rescoring retrieved docs
         self.graph = None
+        self.answer_cache = None # SemanticCache of QueryResponses keyed by query embedding
         self.vectorstore = None
+        self.pinecone = None # Pinecone client
+        self.pc_index = None # Pinecone index, shared by every vector store call
         self.embeddings = None
         self.scraper = None
+        self.http = None # shared aiohttp session
         self.llm = None
 
+    @property
+    def processed_urls(self) -> set[str]:
+        """Urls of the sources ingested successfully. Derived from `sources`, so it cannot drift from them."""
+        return {str(source.url) for source in self.sources.values() if source.status == "processed"}
+
 
 # Initialize a global instance of the application state
 app_state = AppState()
\ No newline at end of file
@@ -1,9 +1,12 @@
-from pydantic import BaseModel, HttpUrl, Field
+from pydantic import BaseModel, ConfigDict, HttpUrl, Field
 from typing import List, Dict, Optional, Literal
 from datetime import datetime
 from langchain_core.documents import Document
 from typing_extensions import List, TypedDict
 
+# Shared by every model: unknown fields are dropped instead of validated, and assignment is not re-validated
+MODEL_CONFIG = ConfigDict(extra='ignore', validate_assignment=False, arbitrary_types_allowed=True)
+
 
 class GraphState(TypedDict):
     question: str
@@ -12,11 +15,16 @@ class GraphState(TypedDict):
 
 
 class SourceCreate(BaseModel):
+    model_config = MODEL_CONFIG
+
     url: HttpUrl
     description: Optional[str]
 
 
 class SourceState(BaseModel):
+    model_config = MODEL_CONFIG
+
+    id: Optional[str] = None
     url: HttpUrl
     status: Literal["pending", "processed", "failed"] = "pending"
     text: Optional[str] = None
@@ -24,10 +32,14 @@ class SourceState(BaseModel):
 
 
 class QueryRequest(BaseModel):
+    model_config = MODEL_CONFIG
+
     query: str
 
 
 class QueryResponse(BaseModel):
+    model_config = MODEL_CONFIG
+
     query: str
     answer: str
     sources: List[str]
@@ -35,6 +47,8 @@ class QueryResponse(BaseModel):
 
 class GradeDocuments(BaseModel):
     """Grade documents using a binary score for relevance check."""
+    model_config = MODEL_CONFIG
+
     binary_score: str = Field(
         description="Relevance score: 'yes' if relevant, or 'no' if not relevant"
     )
\ No newline at end of file
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set
+from langchain_core.documents import Document
+
+
+class ScrapeCache:
+    """
+    Remembers, per URL, a sha256 of the content last ingested and the ids of the vectors holding its chunks.
+    A page whose content hash matches is unchanged: ingesting it again can skip chunking, embedding and
+    upserting. Identical chunks of different pages (boilerplate) share one vector, so a vector is only
+    deleted once no page references it. Persisted as one JSON file.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, dict] = {} # url -> {"hash": str, "ids": [str]}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def content_hash(docs: List[Document]) -> str:
+        """sha256 of the scraped documents' text."""
+        digest = hashlib.sha256()
+        for doc in docs:
+            digest.update(doc.page_content.encode())
+            digest.update(b"\0") # document boundary
+        return digest.hexdigest()
+
+    def get(self, url: str) -> Optional[str]:
+        """Content hash last ingested for `url`, if any."""
+        entry = self._entries.get(url)
+        return entry["hash"] if entry else None
+
+    def ids(self, url: str) -> List[str]:
+        """Ids of the vectors holding the chunks of `url`, as of its last ingest."""
+        entry = self._entries.get(url)
+        return entry["ids"] if entry else []
+
+    def stored_chunks(self) -> Dict[str, str]:
+        """Chunk digest (hex) -> id of the vector holding that chunk, for every chunk of the cached pages."""
+        return {vector_id.rsplit(":", 1)[1]: vector_id for entry in self._entries.values() for vector_id in entry["ids"]}
+
+    def orphaned(self, updates: Dict[str, Iterable[str]]) -> Set[str]:
+        """Ids that no page would reference once `updates` (url -> its new ids) are put: the vectors to delete."""
+        referenced = {vector_id for url, entry in self._entries.items() if url not in updates for vector_id in entry["ids"]}
+        for ids in updates.values():
+            referenced.update(ids)
+        return {vector_id for url in updates for vector_id in self.ids(url)} - referenced
+
+    def put(self, url: str, content_hash: str, ids: List[str]):
+        self._entries[url] = {"hash": content_hash, "ids": ids}
+
+    def discard(self, url: str):
+        self._entries.pop(url, None)
+
+    def load(self, path: str):
+        if os.path.exists(path):
+            with open(path) as f:
+                self._entries = json.load(f)
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self._entries, f)
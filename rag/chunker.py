@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List
+import tiktoken
+from langchain_core.documents import Document
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Load a tiktoken encoding once per process (the BPE merge table is loaded lazily, on first use)."""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def _paragraph_batches(text: str, paragraphs: int) -> Iterator[str]:
+    """Yield consecutive slices of `text` holding `paragraphs` paragraphs each (separators kept)."""
+    start = 0
+    while start < len(text):
+        end = start
+        for _ in range(paragraphs):
+            end = text.find("\n\n", end)
+            if end == -1:
+                end = len(text)
+                break
+            end += 2
+        yield text[start:end]
+        start = end
+
+
+def iter_chunks(text: str, chunk_size: int = 512, chunk_overlap: int = 64, encoding_name: str = "cl100k_base", paragraphs_per_batch: int = 10) -> Iterator[str]:
+    """
+    Lazily split text into windows of `chunk_size` tokens, each overlapping the previous one by `chunk_overlap` tokens.
+    Paragraphs are tokenized a batch at a time and windows are sliced off the token buffer as soon as they fill,
+    so only one batch of tokens is held in memory, not the token array of the whole page.
+    """
+    encoding = get_encoding(encoding_name)
+    step = chunk_size - chunk_overlap
+    buffer: List[int] = []
+    emitted = False
+    for batch in _paragraph_batches(text, paragraphs_per_batch):
+        buffer.extend(encoding.encode_ordinary(batch)) # special tokens are plain text here: skip the check for them
+        while len(buffer) >= chunk_size:
+            yield encoding.decode(buffer[:chunk_size])
+            emitted = True
+            del buffer[:step]
+    # the last window must add new tokens past the previous overlap
+    if len(buffer) > chunk_overlap or (buffer and not emitted):
+        yield encoding.decode(buffer)
+
+
+def chunk_tokens(text: str, chunk_size: int = 512, chunk_overlap: int = 64, encoding_name: str = "cl100k_base") -> List[str]:
+    """All the windows of iter_chunks, as a list."""
+    return list(iter_chunks(text, chunk_size, chunk_overlap, encoding_name))
+
+
+def chunk_documents(docs: List[Document], chunk_size: int = 512, chunk_overlap: int = 64) -> List[Document]:
+    """Split documents into token windows. Each chunk keeps a copy of its document's metadata."""
+    return [
+        Document(page_content=chunk, metadata=dict(doc.metadata))
+        for doc in docs
+        for chunk in iter_chunks(doc.page_content, chunk_size, chunk_overlap)
+    ]
+
+
+def chunk_many(doc_groups: List[List[Document]], chunk_size: int = 512, chunk_overlap: int = 64) -> List[List[Document]]:
+    """
+    Run chunk_documents over several groups of documents (e.g. one group per source) in a thread pool.
+    tiktoken releases the GIL while encoding, so the groups are tokenized in parallel.
+
+    Returns:
+        The chunks of each group, in the order of `doc_groups`.
+    """
+    if not doc_groups:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(doc_groups), os.cpu_count() or 1)) as executor:
+        return list(executor.map(lambda docs: chunk_documents(docs, chunk_size, chunk_overlap), doc_groups))
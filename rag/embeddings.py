@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
+import tiktoken
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from rag.chunker import get_encoding
+
+
+@lru_cache(maxsize=None)
+def _encoding_for_model(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return get_encoding("cl100k_base")
+
+
+class BatchedOpenAIEmbeddings(OpenAIEmbeddings):
+    """
+    OpenAIEmbeddings whose async path embeds token-budgeted mini-batches concurrently,
+    instead of sending the chunks one request after the other.
+    """
+
+    max_batch_tokens: int = 20000  # token budget of a single embeddings request
+    max_concurrency: int = 16  # embeddings requests in flight at once
+
+    async def aembed_documents(self, texts: List[str], chunk_size: Optional[int] = None, **kwargs) -> List[List[float]]:
+        """
+        Sort the texts by token length, pack them into batches of at most `max_batch_tokens`
+        (and `chunk_size` inputs, one request each), and embed the batches concurrently. Vectors are returned in the order of `texts`.
+        """
+        if not texts:
+            return []
+
+        encoding = _encoding_for_model(self.model)
+        lengths = [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+        # Similar-length texts end up in the same batch, so batches fill their budget evenly
+        batches, batch, batch_tokens = [], [], 0
+        for i in sorted(range(len(texts)), key=lengths.__getitem__):
+            if batch and (batch_tokens + lengths[i] > self.max_batch_tokens or len(batch) == self.chunk_size):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += lengths[i]
+        batches.append(batch)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        embed = super().aembed_documents
+
+        async def embed_batch(indices):
+            async with semaphore:
+                return await embed([texts[i] for i in indices], chunk_size=chunk_size, **kwargs)
+
+        results = await asyncio.gather(*[embed_batch(indices) for indices in batches])
+
+        # Restore the original order
+        vectors = [None] * len(texts)
+        for indices, batch_vectors in zip(batches, results):
+            for i, vector in zip(indices, batch_vectors):
+                vectors[i] = vector
+        return vectors
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model and keeps recent query embeddings in an LRU cache, so repeated
+    queries skip the embeddings API. Document embeddings are passed through uncached.
+    """
+
+    def __init__(self, embeddings: Embeddings, maxsize: int = 4096):
+        self.embeddings = embeddings
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock() # sync queries may run on executor threads
+
+    def cache_info(self) -> dict:
+        """Hit/miss counters and current size of the query cache."""
+        return {"hits": self.hits, "misses": self.misses, "maxsize": self.maxsize, "size": len(self._cache)}
+
+    def _get(self, text: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.hits += 1
+            return list(vector)
+
+    def _put(self, text: str, vector: List[float]):
+        with self._lock:
+            self._cache[text] = tuple(vector) # immutable, callers get a fresh list
+            self._cache.move_to_end(text)
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._put(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._put(text, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
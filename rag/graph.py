@@ -1,13 +1,20 @@
+import asyncio
+import logging
+from functools import lru_cache
 from typing import Literal
 from langgraph.graph import StateGraph, START, END, MessagesState
 from langgraph.prebuilt import ToolNode, tools_condition
-from core.state import app_state
-from models.schemas import GradeDocuments
 from langchain import hub
 from models.schemas import GraphState
+from core.config import RERANK_CANDIDATES, CONTEXT_DOCS, MMR_FETCH_K, MMR_LAMBDA, SAVE_GRAPH_PNG
 
+logger = logging.getLogger(__name__)
 
-prompt = hub.pull("rlm/rag-prompt")
+
+@lru_cache(maxsize=1)
+def _get_rag_prompt():
+    """Pull the RAG prompt from the hub on first use (a network call), not at import."""
+    return hub.pull("rlm/rag-prompt")
 # """ human
 # You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If you don't know the answer, just say that you don't know. Use three sentences maximum and keep the answer concise.
 # Question: {question} 
@@ -15,17 +22,32 @@ prompt = hub.pull("rlm/rag-prompt")
 # Answer:
 # """
 
-def create_rag_graph(llm, _):
-    def retrieve(state: GraphState):
-        retrieved_docs = app_state.vectorstore.similarity_search(state["question"])
-        print('DEBUG <graph.retrieve>', f'{len(retrieved_docs)} docs:', [f'{doc.page_content[:20]}...' for doc in retrieved_docs])
+def create_rag_graph(llm, vectorstore, reranker=None):
+    """
+    Create the retrieve -> generate graph. Compiled once at startup and reused across queries.
+    Retrieval is MMR (relevant but not redundant docs, no LLM grading). With a reranker, it fetches
+    RERANK_CANDIDATES docs and keeps the CONTEXT_DOCS best after reranking.
+    """
+    prompt = _get_rag_prompt()
+
+    async def retrieve(state: GraphState):
+        k = CONTEXT_DOCS if reranker is None else RERANK_CANDIDATES
+        candidates = await vectorstore.amax_marginal_relevance_search(
+            state["question"], k=k, fetch_k=MMR_FETCH_K, lambda_mult=MMR_LAMBDA
+        )
+        if reranker is None:
+            retrieved_docs = candidates
+        else:
+            retrieved_docs = await asyncio.to_thread(reranker.rerank, state["question"], candidates, CONTEXT_DOCS)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('retrieve: %d docs: %s', len(retrieved_docs), [f'{doc.page_content[:20]}...' for doc in retrieved_docs])
         return {"context": retrieved_docs}
 
-    def generate(state: GraphState):
+    async def generate(state: GraphState):
         docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-        custom_prompt = prompt.invoke({"question": state["question"], "context": docs_content})
+        custom_prompt = await prompt.ainvoke({"question": state["question"], "context": docs_content})
 
-        response = llm.invoke(custom_prompt)
+        response = await llm.ainvoke(custom_prompt)
         return {"answer": response.content}
 
 
@@ -33,26 +55,21 @@ def create_rag_graph(llm, _):
     graph_builder = StateGraph(GraphState).add_sequence([retrieve, generate])
     graph_builder.add_edge(START, "retrieve")
     agent = graph_builder.compile()
-    # save graph visualization to file
-    graph_png = agent.get_graph().draw_mermaid_png()
-    with open("agent_graph.png", "wb") as f:
-        f.write(graph_png)
-        
+    # save graph visualization to file (rendered by the mermaid.ink API: a network call, so opt-in)
+    if SAVE_GRAPH_PNG:
+        graph_png = agent.get_graph().draw_mermaid_png()
+        with open("agent_graph.png", "wb") as f:
+            f.write(graph_png)
+
     return agent 
 
 
 # Agentic RAG WITH MEMORY AND MORE
-# Prompt templates
-GRADE_PROMPT = (
-    "You are a grader assessing relevance of a retrieved document to a user question. \n "
-    "Here is the retrieved document: \n\n {context} \n\n"
-    "Here is the user question: {question} \n"
-    "If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n"
-    "Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question."
-)
+# Prompt templates. Static instructions go in the system message and the per-query values last, so every call
+# shares the same prompt prefix (OpenAI reuses cached prefixes automatically, once they reach 1024 tokens)
+REWRITE_SYSTEM = "Look at the input and try to reason about the underlying semantic intent / meaning."
 
 REWRITE_PROMPT = (
-    "Look at the input and try to reason about the underlying semantic intent / meaning.\n"
     "Here is the initial question:"
     "\n ------- \n"
     "{question}"
@@ -60,74 +77,75 @@ REWRITE_PROMPT = (
     "Formulate an improved question:"
 )
 
-GENERATE_PROMPT = (
+# Grading and answering share one prompt (one LLM round-trip): the model either answers or asks for a rewrite
+REWRITE_SIGNAL = "REWRITE"
+
+GENERATE_SYSTEM = (
     "You are an assistant for question-answering tasks. "
-    "Use the following pieces of retrieved context to answer the question. "
-    "If the answer is not found directly in the retrieved context, say that the context provided is not relevant to answer the question. "
-    "Use three sentences maximum and keep the answer concise.\n"
-    "Question: {question} \n"
-    "Context: {context}"
+    "First assess the relevance of the retrieved context to the question: it is relevant if it contains keyword(s) or semantic meaning related to the question. "
+    "If the context is not relevant, respond with exactly REWRITE and nothing else. "
+    "Otherwise, use the retrieved context to answer the question. "
+    "Use three sentences maximum and keep the answer concise."
 )
 
-# Nodes
-def generate_query_or_respond(state: MessagesState):
-    """Call the model to generate a response based on the current state."""
-    response = (
-        app_state.llm.bind_tools([app_state.retriever_tool]).invoke(state["messages"])
-    )
-    # Use a list for consistent handling of multiple messages
-    return {"messages": [response]}
+GENERATE_PROMPT = (
+    "Context: {context} \n"
+    "Question: {question}"
+)
 
 
-def grade_documents(state: MessagesState) -> Literal["generate_answer", "rewrite_question"]:
-    """Determine whether the retrieved documents are relevant to the question."""
-    question = state["messages"][0].content
-    context = state["messages"][-1].content
-    
-    prompt = GRADE_PROMPT.format(question=question, context=context)
-    
-    response = (
-        app_state.llm
-        .with_structured_output(GradeDocuments).invoke(
-            [{"role": "user", "content": prompt}]
-        )
-    )
-    score = response.binary_score
-    
-    if score == "yes":
-        return "generate_answer"
-    else:
+def route_answer(state: MessagesState) -> Literal["rewrite_question", "__end__"]:
+    """Finish with the answer, or rewrite the question when the model found the context irrelevant."""
+    if state["messages"][-1].content.strip().startswith(REWRITE_SIGNAL):
         return "rewrite_question"
+    return END
 
 
-def rewrite_question(state: MessagesState):
-    """Rewrite the original user question."""
-    messages = state["messages"]
-    question = messages[0].content
-    prompt = REWRITE_PROMPT.format(question=question)
-    response = app_state.llm.invoke([{"role": "user", "content": prompt}])
-    return {"messages": [{"role": "user", "content": response.content}]}
-
-
-def generate_answer(state: MessagesState):
-    """Generate an answer."""
-    question = state["messages"][0].content
-    context = state["messages"][-1].content
-    prompt = GENERATE_PROMPT.format(question=question, context=context)
-    response = app_state.llm.invoke([{"role": "user", "content": prompt}])
-
-    print('DEBUG:', prompt, '\n\n\n', response)
-    return {"messages": [response]}
-
 def create_rag_graph_v2(llm, retriever_tool):
-    """Create the RAG workflow graph."""
+    """
+    Create the RAG workflow graph. Compile it once and reuse it across queries: the nodes close over
+    the LLMs bound here, so running the graph never rebuilds tool schemas.
+    """
+    llm_with_tools = llm.bind_tools([retriever_tool])
+
+    # Nodes
+    async def generate_query_or_respond(state: MessagesState):
+        """Call the model to generate a response based on the current state."""
+        response = await llm_with_tools.ainvoke(state["messages"])
+        # Use a list for consistent handling of multiple messages
+        return {"messages": [response]}
+
+    async def rewrite_question(state: MessagesState):
+        """Rewrite the original user question."""
+        messages = state["messages"]
+        question = messages[0].content
+        prompt = REWRITE_PROMPT.format(question=question)
+        response = await llm.ainvoke([
+            {"role": "system", "content": REWRITE_SYSTEM},
+            {"role": "user", "content": prompt},
+        ])
+        return {"messages": [{"role": "user", "content": response.content}]}
+
+    async def generate_or_rewrite(state: MessagesState):
+        """Grade the retrieved context and generate an answer from it, in a single LLM call."""
+        question = state["messages"][0].content
+        context = state["messages"][-1].content
+        prompt = GENERATE_PROMPT.format(question=question, context=context)
+        response = await llm.ainvoke([
+            {"role": "system", "content": GENERATE_SYSTEM},
+            {"role": "user", "content": prompt},
+        ])
+
+        logger.debug('generate_or_rewrite prompt: %s\nresponse: %s', prompt, response)
+        return {"messages": [response]}
+
     workflow = StateGraph(MessagesState)
     
     # Define nodes
     workflow.add_node("generate_query_or_respond", generate_query_or_respond)
     workflow.add_node("retrieve", ToolNode([retriever_tool]))
     workflow.add_node("rewrite_question", rewrite_question)
-    workflow.add_node("generate_answer", generate_answer)
+    workflow.add_node("generate_or_rewrite", generate_or_rewrite)
     
     # Define edges
     workflow.add_edge(START, "generate_query_or_respond")
@@ -139,11 +157,11 @@ def create_rag_graph_v2(llm, retriever_tool):
             END: END,
         },
     )
+    workflow.add_edge("retrieve", "generate_or_rewrite")
     workflow.add_conditional_edges(
-        "retrieve",
-        grade_documents,
+        "generate_or_rewrite",
+        route_answer,
     )
-    workflow.add_edge("generate_answer", END)
     workflow.add_edge("rewrite_question", "generate_query_or_respond")
     
     return workflow.compile()
\ No newline at end of file
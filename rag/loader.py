@@ -1,79 +1,194 @@
-from typing import Optional
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import asyncio
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+from rag.chunker import chunk_many
 from core.state import app_state
-from langchain.schema import Document
 import datetime
 from models.schemas import SourceState
+from core.config import CHUNK_SIZE, CHUNK_OVERLAP, INGEST_CONCURRENCY, INGEST_PIPELINE_CHUNKS
+
+logger = logging.getLogger(__name__)
 
 async def ingest_webpage(url: str, description: Optional[str] = None) -> SourceState:
     """
     Uses vector store from global state. Process a source URL: extract content, and add it to the vector store, with embedding and splits.
     (Does not do any post-processing of the HTML)
-    
+
     Args:
         url: The URL to process
         description: Optional description of the source
-        
+
     Returns:
         A SourceState object with the status of the ingestion process.
     """
-    
+    results = await bulk_ingest([(url, description)])
+    return results[0]
+
+
+async def ingest_worker():
+    """
+    Consume (source_id, url, description) jobs from the ingestion queue until cancelled,
+    recording the outcome of each job in app_state.sources. Sources deleted in the meantime stay deleted.
+    """
+    while True:
+        source_id, url, description = await app_state.ingest_queue.get()
+        try:
+            if source_id not in app_state.sources:
+                continue # deleted while queued
+            try:
+                result = await ingest_webpage(url, description)
+            except Exception:
+                logger.exception('Failed to add source %s', url)
+                result = SourceState(url=url, status="failed")
+
+            if source_id in app_state.sources:
+                app_state.sources[source_id] = result.model_copy(update={"id": source_id})
+                if result.status == "processed":
+                    app_state.answer_cache.clear() # cached answers predate this source
+            elif result.status == "processed" and url not in app_state.processed_urls:
+                # deleted while being ingested, and no other source covers the url: undo the upsert
+                try:
+                    await _forget_source(url)
+                except Exception:
+                    logger.exception('Failed to remove deleted source %s', url)
+        finally:
+            app_state.ingest_queue.task_done()
+
+
+async def _embed_and_store(texts: List[str], metadatas: List[dict], ids: List[str]):
+    """
+    Embed and upsert chunks as a pipeline: the chunks go in slices of INGEST_PIPELINE_CHUNKS (each embedded
+    with concurrent requests), and each slice is upserted in the background while the next one is embedded.
+    """
+    upserts = []
     try:
-        # Load docs from the URL
-        docs = await app_state.scraper.scrape_content(str(url), partial=True)
-        
-        # Print original document sizes
+        for start in range(0, len(texts), INGEST_PIPELINE_CHUNKS):
+            end = start + INGEST_PIPELINE_CHUNKS
+            vectors = await app_state.embeddings.aembed_documents(texts[start:end])
+            upserts.append(asyncio.create_task(app_state.vectorstore.aadd_embeddings(
+                texts[start:end], vectors, metadatas=metadatas[start:end], ids=ids[start:end]
+            )))
+    finally:
+        # wait for the upserts in flight even if embedding failed, then surface the first error
+        results = await asyncio.gather(*upserts, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+
+async def _forget_source(url: str):
+    """Delete the chunks of `url` no other page shares, and its scrape cache entry, so ingesting it again starts over."""
+    orphaned = app_state.scrape_cache.orphaned({url: []})
+    if orphaned:
+        await app_state.vectorstore.adelete(ids=sorted(orphaned))
+    app_state.scrape_cache.discard(url)
+
+
+async def bulk_ingest(sources: List[Tuple[str, Optional[str]]]) -> List[SourceState]:
+    """
+    Ingest many sources at once. Pages are fetched concurrently, and the chunks of every source
+    are embedded and upserted together, upserts overlapping with embedding.
+
+    Args:
+        sources: List of (url, description) pairs
+
+    Returns:
+        A list of SourceState objects, in the same order as `sources`.
+    """
+    # Stringify (Pydantic HttpUrl) once, not per chunk
+    sources = [(str(url), description) for url, description in sources]
+
+    # Load docs from all URLs concurrently, at most INGEST_CONCURRENCY at a time to avoid flooding the scraper
+    semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+
+    async def scrape(url):
+        async with semaphore:
+            return await app_state.scraper.scrape_content(url, partial=True)
+
+    scraped = await asyncio.gather(*[scrape(url) for url, _ in sources], return_exceptions=True)
+
+    # Pages unchanged since they were last ingested are already in the store: skip chunking and embedding them
+    content_hashes = [
+        None if isinstance(docs, Exception) else app_state.scrape_cache.content_hash(docs)
+        for docs in scraped
+    ]
+    changed = [
+        not isinstance(docs, Exception) and app_state.scrape_cache.get(url) != content_hash
+        for (url, _), docs, content_hash in zip(sources, scraped, content_hashes)
+    ]
+
+    # Split docs into overlapping token windows for better retrieval (tokenizes each doc once),
+    # one thread per source
+    splits = iter(await asyncio.to_thread(
+        chunk_many,
+        [docs for docs, is_changed in zip(scraped, changed) if is_changed],
+        CHUNK_SIZE,
+        CHUNK_OVERLAP,
+    ))
+
+    states = []
+    texts, metadatas, ids = [], [], []
+    stored = app_state.scrape_cache.stored_chunks() # chunk digest -> id of the vector holding it
+    source_ids = {} # url -> (content hash, ids of all its chunks), recorded in the scrape cache once stored
+    for (url, _), docs, content_hash, is_changed in zip(sources, scraped, content_hashes, changed):
+        if isinstance(docs, Exception):
+            logger.error('Failed to add source %s: %s', url, docs)
+            states.append(SourceState(url=url, status="failed"))
+            continue
+        if not is_changed:
+            logger.debug('Unchanged since last ingest: %s', url)
+            states.append(SourceState(url=url, status="processed", scraped_at=datetime.datetime.now()))
+            continue
+
+        # Log original document sizes
         for i, doc in enumerate(docs):
-            print(f'DEBUG > Original doc {i+1}: {len(doc.page_content)} chars')
-            print(f'DEBUG > First 100 chars: {doc.page_content[:100]}...')
-        
-        # Split docs into chunks for better retrieval
-        # use RecursiveCharacterTextSplitter to optimize splitting of text
-        # use tiktoken encoder to count tokens instead of chars
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=1000, 
-            chunk_overlap=200
-        )
-        doc_splits = text_splitter.split_documents(docs)
-        
-        # Debug the splits
-        print(f'Split results: {len(doc_splits)} chunks. These are the first 3:')
-        for i, split in enumerate(doc_splits[:3]):  # Show first 3 splits
-            print(f'DEBUG > Split {i+1}:')
-            print(f'  - Length: {len(split.page_content)} chars')
-            print(f'  - Preview: {split.page_content[:100]}...')
-            print(f'  - Metadata: {split.metadata}')
-
-        # Add metadata to each doc_split
-        ids = []
-        for idx, doc in enumerate(doc_splits):
-            if not hasattr(doc, 'metadata') or doc.metadata is None:
-                doc.metadata = {}
-            doc.metadata['url'] = str(url)
-            ids.append(f'{url}-SPLIT:{idx}') # specify and ID to allow upsert and prevent duplicates
-        
-        # Batch add documents to the vector store to reduce API calls to vector store and the embedding model
-        batch_size = min(100, len(doc_splits))
-        target_namespace = f'dev'
-
-        print(f'Batching: {len(doc_splits)} splits into batches of {batch_size}')
-        for i in range(0, len(doc_splits), batch_size):
-            batch_docs = doc_splits[i:i+batch_size]
-            batch_ids = ids[i:i+batch_size]
-
-            print(f'Processing batch {i//batch_size + 1}: {len(batch_docs)} documents')
-            app_state.vectorstore.add_documents(documents=batch_docs, ids=batch_ids, namespace=target_namespace)
-        
-        return SourceState(
-            url=url,
-            status="processed",
-            scraped_at=datetime.datetime.now()
-        )
-    
-    except Exception as e:
-        print('Failed to add source:', e)
-        return SourceState(
-            url=url,
-            status="failed"
-        )
\ No newline at end of file
+            logger.debug('Original doc %d: %d chars, starting %.100r', i + 1, len(doc.page_content), doc.page_content)
+
+        doc_splits = next(splits)
+        logger.debug('Split results for %s: %d chunks', url, len(doc_splits))
+
+        # Flatten the splits of every source, tagging each chunk with its source url.
+        # Chunks already stored (or earlier in this batch), like boilerplate shared by pages of the same site, are
+        # not embedded again: the page references the existing vector instead
+        url_ids = set() # ids of the vectors holding this page's chunks, possibly stored for other pages
+        for doc in doc_splits:
+            digest = hashlib.blake2b(doc.page_content.encode(), digest_size=16).hexdigest()
+            if digest in stored:
+                url_ids.add(stored[digest])
+                continue
+            chunk_id = f'{url}:{digest}' # content-addressed: an unchanged chunk keeps its id across re-ingests
+            stored[digest] = chunk_id
+            texts.append(doc.page_content)
+            doc.metadata['url'] = url # chunks own a copy of their page's metadata (see chunk_documents)
+            metadatas.append(doc.metadata)
+            ids.append(chunk_id)
+            url_ids.add(chunk_id)
+        source_ids[url] = (content_hash, url_ids)
+
+        states.append(SourceState(url=url, status="processed", scraped_at=datetime.datetime.now()))
+
+    try:
+        # Chunks the scrape cache does not know of (e.g. stored by an ingest that failed later) may still be in the
+        # store: ask it which ids it already holds (one round-trip per 100 ids)
+        existing = await app_state.vectorstore.aexisting_ids(ids) if ids else set()
+        if existing:
+            keep = [i for i, vector_id in enumerate(ids) if vector_id not in existing]
+            texts, metadatas, ids = ([values[i] for i in keep] for values in (texts, metadatas, ids))
+
+        if texts:
+            logger.info('Embedding %d chunks from %d sources', len(texts), len(sources))
+            await _embed_and_store(texts, metadatas, ids)
+        # Content-addressed ids never overwrite the old version of a changed page: delete its outdated chunks,
+        # unless another page still references them
+        orphaned = app_state.scrape_cache.orphaned({url: url_ids for url, (_, url_ids) in source_ids.items()})
+        if orphaned:
+            logger.info('Deleting %d outdated chunks', len(orphaned))
+            await app_state.vectorstore.adelete(ids=sorted(orphaned))
+    except Exception:
+        logger.exception('Failed to add sources')
+        return [SourceState(url=state.url, status="failed") for state in states]
+
+    for url, (content_hash, url_ids) in source_ids.items():
+        app_state.scrape_cache.put(url, content_hash, sorted(url_ids))
+    return states
@@ -0,0 +1,56 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+from langchain_core.documents import Document
+
+# Quoted phrases and file names: the vector search already matches these literally, a cross-encoder adds little
+LITERAL_QUERY = re.compile(r'"[^"]+"|\b[\w-]+\.(?:py|js|ts|md|txt|json|ya?ml|pdf|html?|csv)\b')
+
+
+class Reranker:
+    """
+    Rescores retrieved documents with a cross-encoder, which reads query and document together and ranks
+    more precisely than embedding similarity. Scores are cached per (query, document) pair, at most
+    `cache_size` of them (oldest evicted first); with `ttl` (seconds), a score older than that is computed again.
+    """
+
+    def __init__(self, model_name: str, cache_size: int = 4096, ttl: Optional[float] = None):
+        # imported here: sentence-transformers (and torch) is only needed when reranking is enabled
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name)
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._cache: OrderedDict = OrderedDict() # key -> (score, monotonic time it was computed)
+        self._lock = threading.Lock() # rerank runs on executor threads
+
+    @staticmethod
+    def _key(query: str, text: str) -> bytes:
+        return hashlib.md5(query.encode()).digest() + hashlib.md5(text.encode()).digest()
+
+    def rerank(self, query: str, docs: List[Document], top_n: int) -> List[Document]:
+        """Return the `top_n` most relevant docs, best first. Blocking (model inference): call it from a thread."""
+        if len(docs) <= 1 or LITERAL_QUERY.search(query):
+            return docs[:top_n]
+
+        keys = [self._key(query, doc.page_content) for doc in docs]
+        now = time.monotonic()
+        expired = now - self.ttl if self.ttl is not None else float("-inf")
+        with self._lock:
+            entries = [self._cache.get(key) for key in keys]
+        scores = [entry[0] if entry is not None and entry[1] >= expired else None for entry in entries]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            predicted = self.model.predict([(query, docs[i].page_content) for i in missing])
+            with self._lock:
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                    self._cache[keys[i]] = (scores[i], now)
+                    self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        ranked = sorted(range(len(docs)), key=scores.__getitem__, reverse=True)
+        return [docs[i] for i in ranked[:top_n]]
@@ -1,20 +1,82 @@
-from playwright.async_api import async_playwright
-from pydantic import BaseModel
-from openai import OpenAI
-from langchain_community.document_loaders import WebBaseLoader
+import asyncio
+import re
+import aiohttp
+from typing import Optional
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from langchain_core.documents import Document
 from typing_extensions import List
 import bs4
 
+MIN_STATIC_TEXT_CHARS = 200 # less text than this in the static HTML: likely a JavaScript placeholder, render it
+NETWORK_IDLE_TIMEOUT_MS = 3000
+STATIC_FETCH_TIMEOUT_S = 10 # a plain HTTP fetch slower than this falls back to the browser
+META_REFRESH = re.compile(r"""<meta[^>]+http-equiv=["']?refresh""", re.IGNORECASE)
+BLOCKED_RESOURCES = frozenset({"image", "media", "font", "stylesheet", "websocket"}) # not needed to extract text
+
+
+async def _block_assets(route):
+    """Route handler: abort requests for resources that don't affect the page's text."""
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """
+    Fixed set of warm browser contexts, checked out for one render at a time: a render waits for a free
+    context instead of creating one. Cookies are cleared between uses, and a context is replaced by a
+    fresh one after `max_uses` renders, bounding what a long-lived context accumulates.
+    """
+
+    def __init__(self, browser, size: int = 5, max_uses: int = 50):
+        self.browser = browser
+        self.size = size
+        self.max_uses = max_uses
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._uses = {} # context -> renders served
+
+    async def _new_context(self):
+        context = await self.browser.new_context()
+        await context.route("**/*", _block_assets)
+        self._uses[context] = 0
+        return context
+
+    async def warmup(self):
+        """Create every context up front, so no render pays for it."""
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._new_context())
+
+    async def acquire(self):
+        return await self._idle.get()
+
+    async def release(self, context):
+        """Return a context to the pool, recycling it if it has served `max_uses` renders."""
+        self._uses[context] += 1
+        try:
+            if self._uses[context] >= self.max_uses:
+                del self._uses[context]
+                await context.close()
+                context = await self._new_context()
+            else:
+                await context.clear_cookies()
+        finally:
+            self._idle.put_nowait(context)
+
+
 class WebScraperAgent:
     """
     Inits a browser session. Can get content and take screenshots.
+    One browser is shared by all calls; each render checks out one of its `max_pages` pooled contexts.
     """
 
-    def __init__(self):
+    def __init__(self, http: Optional[aiohttp.ClientSession] = None, max_pages: int = 5):
+        self.http = http # shared session for plain HTTP fetches (keep-alive across calls)
         self.playwright = None
         self.browser = None
-        self.page = None
+        self.pool = None
+        self.max_pages = max_pages
+        self._launch_lock = asyncio.Lock() # concurrent first scrapes launch a single browser
 
     async def init_browser(self):
         # https://playwright.dev/python/docs/intro
@@ -37,11 +99,74 @@ class WebScraperAgent:
                 "--disable-background-networking"
             ]
         )
-        self.page = await self.browser.new_page()
+        self.pool = BrowserPool(self.browser, size=self.max_pages)
+        await self.pool.warmup()
+
+    @staticmethod
+    def extract_text(html: str) -> str:
+        """
+        Text of the post body (post-content/post-title/post-header classes). Pages without those
+        classes fall back to the whole page's text, minus scripts, styles and navigation.
+        """
+        soup = bs4.BeautifulSoup(
+            html,
+            "lxml",
+            parse_only=bs4.SoupStrainer(
+                class_=("post-content", "post-title", "post-header")
+            ),
+        )
+        text = soup.get_text()
+        if text.strip():
+            return text
+        return WebScraperAgent.visible_text(html)
+
+    @staticmethod
+    def visible_text(html: str) -> str:
+        """Text of the whole page, minus scripts, styles and navigation."""
+        soup = bs4.BeautifulSoup(html, "lxml")
+        for tag in soup(["script", "style", "noscript", "nav", "header", "footer"]):
+            tag.decompose()
+        return soup.get_text()
+
+    @staticmethod
+    def needs_browser(html: str) -> bool:
+        """Whether static HTML looks like a JavaScript placeholder (little text, or a meta refresh) that must be rendered."""
+        return bool(META_REFRESH.search(html)) or len(WebScraperAgent.visible_text(html).strip()) < MIN_STATIC_TEXT_CHARS
+
+    async def fetch_static(self, url_str: str) -> str:
+        """Fetch the page HTML over the shared aiohttp session, without running its scripts."""
+        timeout = aiohttp.ClientTimeout(total=STATIC_FETCH_TIMEOUT_S)
+        async with self.http.get(url_str, timeout=timeout) as response:
+            response.raise_for_status()
+            return await response.text()
+
+    async def render(self, url_str: str) -> str:
+        """Load the page in the shared browser and return its HTML after scripts ran."""
+        async with self._launch_lock:
+            if not self.browser or not self.browser.is_connected():
+                await self.init_browser()
+
+        # one context per concurrent render: renders share the browser, not state
+        context = await self.pool.acquire()
+        try:
+            page = await context.new_page()
+            try:
+                await page.goto(url_str, wait_until="load")
+                try:
+                    # Wait for dynamic content: done as soon as the network goes quiet, at most NETWORK_IDLE_TIMEOUT_MS
+                    await page.wait_for_load_state("networkidle", timeout=NETWORK_IDLE_TIMEOUT_MS)
+                except PlaywrightTimeoutError:
+                    pass # pages that keep polling never go idle: take what has rendered so far
+                return await page.content()
+            finally:
+                await page.close()
+        finally:
+            await self.pool.release(context)
 
     async def scrape_content(self, url, partial=True) -> List[Document]:
         """
-        Gets the HTML content from the page as a string. The final string has many white space because it adds many '\n'. The partial algorithm uses WebBaseLoader, while the integral algo uses Playwright to grab the entire HTML.
+        Gets the HTML content from the page as a string. The final string has many white space because it adds many '\n'. The partial algorithm fetches the page over the shared aiohttp session, while the integral algo grabs the entire HTML.
+        Both only use Playwright when the static HTML has (almost) no text, i.e. the page is rendered by JavaScript.
         Params
             URL (str): the target URL to scrape content from
             partial (boolean = True): whether to get content from only a few specific HTML tags
@@ -49,35 +174,36 @@ class WebScraperAgent:
         Returns:
             List[Document]: List containing one or more Document objects with the page content
         """
+        # Convert URL to string to handle Pydantic HttpUrl objects
+        url_str = str(url)
 
         if partial:
-            self.loader = WebBaseLoader(
-                web_paths=(str(url),),
-                bs_kwargs=dict(
-                    parse_only=bs4.SoupStrainer(
-                        class_=("post-content", "post-title", "post-header")
-                    )
-                ),
-            )
-            
-            docs = self.loader.load()
-            return docs
+            # pages that refuse or time out plain HTTP clients (e.g. a 403 to non-browsers) are rendered instead
+            try:
+                text = self.extract_text(await self.fetch_static(url_str))
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                text = ""
+            if len(text.strip()) < MIN_STATIC_TEXT_CHARS:
+                text = self.extract_text(await self.render(url_str))
+            return [Document(page_content=text, metadata={"source": url_str})]
         
         else:
-            if not self.page or self.page.is_closed():
-                await self.init_browser()
-            
-            # Convert URL to string to handle Pydantic HttpUrl objects
-            url_str = str(url)
-            await self.page.goto(url_str, wait_until="load")
-            await self.page.wait_for_timeout(2000)  # Wait for dynamic content
-            content = await self.page.content()
+            # static pages skip the browser entirely
+            try:
+                content = await self.fetch_static(url_str)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                content = None
+            if content is None or self.needs_browser(content):
+                content = await self.render(url_str)
             # Convert the raw HTML string to a Document object
             return [Document(page_content=content)]
 
     async def close(self):
-        await self.browser.close()
-        await self.playwright.stop()
+        """Close the browser, if it was started. Safe to call more than once."""
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
         self.playwright = None
         self.browser = None
-        self.page = None
\ No newline at end of file
+        self.pool = None
\ No newline at end of file
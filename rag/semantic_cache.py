@@ -0,0 +1,56 @@
+import time
+from typing import Any, List, Optional
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Bounded cache keyed by embedding similarity: a lookup returns the value stored for the most similar
+    cached vector, if its cosine similarity reaches `threshold`. All cached vectors live in one matrix,
+    so a lookup is a single matrix-vector product. When full, the oldest entry is evicted (FIFO).
+    With `ttl` (seconds), entries older than that are ignored by lookups.
+    """
+
+    def __init__(self, dim: int, threshold: float = 0.95, max_size: int = 1024, ttl: Optional[float] = None):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._matrix = np.zeros((max_size, dim), dtype=np.float32)
+        self._values: List[Any] = [None] * max_size
+        self._added_at = np.zeros(max_size, dtype=np.float64) # monotonic time of each add
+        self._size = 0
+        self._next = 0 # slot written next (ring buffer)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    def lookup(self, vector, threshold: Optional[float] = None) -> Optional[Any]:
+        """
+        Value of the most similar cached vector, or None when nothing is similar enough.
+        `threshold` overrides the cache's own for this lookup.
+        """
+        if self._size == 0:
+            return None
+        scores = self._matrix[:self._size] @ self._normalize(vector)
+        if self.ttl is not None:
+            scores[self._added_at[:self._size] < time.monotonic() - self.ttl] = -np.inf
+        best = int(np.argmax(scores))
+        return self._values[best] if scores[best] >= (self.threshold if threshold is None else threshold) else None
+
+    def add(self, vector, value: Any):
+        self._matrix[self._next] = self._normalize(vector)
+        self._values[self._next] = value
+        self._added_at[self._next] = time.monotonic()
+        self._next = (self._next + 1) % self.max_size
+        self._size = min(self._size + 1, self.max_size)
+
+    def clear(self):
+        """Drop every entry, e.g. when the sources behind the cached answers change."""
+        self._values = [None] * self.max_size
+        self._size = 0
+        self._next = 0
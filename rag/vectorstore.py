@@ -1,19 +1,34 @@
+import asyncio
+import os
+import uuid
 from pinecone import Pinecone, ServerlessSpec
-from langchain_openai import OpenAIEmbeddings
+from rag.embeddings import BatchedOpenAIEmbeddings, CachedQueryEmbeddings
+from rag.np_vectorstore import NPVectorStore
 from langchain_pinecone import PineconeVectorStore
 from core.config import (
     PINECONE_API_KEY, 
     PINECONE_HOST_URL, 
     PINECONE_INDEX_NAME,
+    PINECONE_NAMESPACE,
     OPENAI_API_KEY,
     EMBEDDING_MODEL,
-    EMBEDDING_DIMENSION
+    EMBEDDING_DIMENSION,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    VECTOR_STORE,
+    QUANTIZE_EMBEDDINGS,
+    HALF_PRECISION_EMBEDDINGS,
+    VECTOR_STORE_PATH,
+    PINECONE_POOL_THREADS,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_BATCH_TOKENS
 )
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
+def init_pinecone_client():
+    """Create the Pinecone client. Build it once and share it: it holds the HTTP connection pool."""
+    return Pinecone(api_key=PINECONE_API_KEY)
 
-def init_pinecone_index(index_name):
-    """Initialize Pinecone client and create index if it doesn't exist. Returns the retrieved index."""
+def init_pinecone_index(pc, index_name):
+    """Create the index if it doesn't exist. Returns the retrieved index."""
 
     # use create_index to store vectors generated by a third-party embedding model
     if not pc.has_index(index_name):
@@ -25,28 +40,121 @@ def init_pinecone_index(index_name):
             spec=ServerlessSpec(cloud="aws", region="us-east-1"),
         )
 
-    return pc.Index(index_name)
+    # a known host skips the describe_index lookup; the thread pool serves async_req upserts
+    return pc.Index(index_name, host=PINECONE_HOST_URL or "", pool_threads=PINECONE_POOL_THREADS)
+
+class PineconeEmbeddingStore(PineconeVectorStore):
+    """PineconeVectorStore that can also upsert precomputed embeddings."""
+
+    def _vector_batches(self, texts, embeddings, metadatas, ids, batch_size):
+        """Build (id, vector, metadata) tuples, in batches of at most `batch_size` (Pinecone caps the payload of an upsert)."""
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = [
+            (vector_id, embedding, {**metadata, self._text_key: text})
+            for vector_id, text, embedding, metadata in zip(ids, texts, embeddings, metadatas)
+        ]
+        return [vectors[i:i+batch_size] for i in range(0, len(vectors), batch_size)]
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None, namespace=None, batch_size=100):
+        """
+        Upsert texts with embeddings computed by the caller, so a batch spanning many sources
+        costs a single embeddings request instead of one per add_documents call.
+
+        Returns:
+            List of ids of the upserted vectors.
+        """
+        if namespace is None:
+            namespace = self._namespace
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        # all batches go out at once on the index's thread pool, then wait for every response
+        async_results = [
+            self.index.upsert(vectors=batch, namespace=namespace, async_req=True)
+            for batch in self._vector_batches(texts, embeddings, metadatas, ids, batch_size)
+        ]
+        [result.get() for result in async_results]
+
+        return ids
+
+    async def aadd_embeddings(self, texts, embeddings, metadatas=None, ids=None, namespace=None, batch_size=100):
+        """Async add_embeddings: waits for the parallel upserts off the event loop."""
+        return await asyncio.to_thread(
+            self.add_embeddings, texts, embeddings,
+            metadatas=metadatas, ids=ids, namespace=namespace, batch_size=batch_size
+        )
+
+    def existing_ids(self, ids, namespace=None, batch_size=100):
+        """Subset of `ids` already in the index (one fetch per `batch_size` ids: they travel in the URL)."""
+        if namespace is None:
+            namespace = self._namespace
+        found = set()
+        for i in range(0, len(ids), batch_size):
+            found.update(self.index.fetch(ids=ids[i:i+batch_size], namespace=namespace).vectors)
+        return found
+
+    async def aexisting_ids(self, ids, namespace=None, batch_size=100):
+        return await asyncio.to_thread(self.existing_ids, ids, namespace=namespace, batch_size=batch_size)
+
+    # PineconeVectorStore's async methods open (and close) a fresh asyncio client and index per call when the
+    # store wraps a sync Index: a new session and TLS handshake per query. Run the sync methods on the shared,
+    # pooled index in a thread instead; query embeddings still go through the async (cached) path.
+    async def asimilarity_search_by_vector_with_score(self, embedding, *, k=4, **kwargs):
+        return await asyncio.to_thread(self.similarity_search_by_vector_with_score, embedding, k=k, **kwargs)
+
+    async def asimilarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in await self.asimilarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    async def asimilarity_search_with_score(self, query, k=4, filter=None, namespace=None, **kwargs):
+        embedding = await self._embedding.aembed_query(query)
+        return await self.asimilarity_search_by_vector_with_score(embedding, k=k, filter=filter, namespace=namespace, **kwargs)
+
+    async def amax_marginal_relevance_search_by_vector(self, embedding, k=4, fetch_k=20, lambda_mult=0.5, filter=None, namespace=None, **kwargs):
+        return await asyncio.to_thread(
+            self.max_marginal_relevance_search_by_vector, embedding,
+            k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter, namespace=namespace, **kwargs
+        )
+
+    async def adelete(self, ids=None, delete_all=None, namespace=None, filter=None, **kwargs):
+        return await asyncio.to_thread(self.delete, ids=ids, delete_all=delete_all, namespace=namespace, filter=filter, **kwargs)
 
 def get_embeddings_model(embedding_model):
-    """Get the OpenAI embeddings model."""
-    return OpenAIEmbeddings(
+    """Get the OpenAI embeddings model, batching concurrent requests on the async path and caching query embeddings."""
+    embeddings = BatchedOpenAIEmbeddings(
         model=embedding_model,
-        openai_api_key=OPENAI_API_KEY
+        openai_api_key=OPENAI_API_KEY,
+        chunk_size=2048,  # OpenAI's max inputs per request: a batch is never re-split client side
+        max_batch_tokens=EMBEDDING_BATCH_TOKENS,
+        max_concurrency=EMBEDDING_CONCURRENCY
     )
+    return CachedQueryEmbeddings(embeddings, maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+
+def get_vector_store(embeddings, index=None):
+    """
+    Return the configured vector store (Pinecone by default) using the given embeddings model.
+    For Pinecone, `index` is the pre-built index shared by the whole app.
+    """
+    if VECTOR_STORE == "numpy":
+        # warm restart: reuse the vectors saved on the last shutdown
+        if os.path.exists(VECTOR_STORE_PATH):
+            return NPVectorStore.load(VECTOR_STORE_PATH, embeddings)
+        return NPVectorStore(embeddings, EMBEDDING_DIMENSION, quantize=QUANTIZE_EMBEDDINGS, half=HALF_PRECISION_EMBEDDINGS)
 
-def get_vector_store(index_name, embedding_model):
-    """Initialize and return a Pinecone vector store with OpenAI embeddings."""
-    # Initialize Pinecone
-    init_pinecone_index(index_name)
-    
-    # Create embeddings model
-    embeddings = get_embeddings_model(embedding_model)
-    
     # Create vector store
-    vectorstore = PineconeVectorStore(
-        index_name=index_name,
+    vectorstore = PineconeEmbeddingStore(
+        index=index,
         embedding=embeddings,
-        text_key="text"  # The key that contains the document text in the metadata
+        text_key="text",  # The key that contains the document text in the metadata
+        namespace=PINECONE_NAMESPACE  # default for every read and write, so search sees what ingestion wrote
     )
     
-    return vectorstore
\ No newline at end of file
+    return vectorstore
+
+def count_vectors(vectorstore):
+    """Number of vectors in the store (in the store's namespace, for Pinecone)."""
+    if isinstance(vectorstore, NPVectorStore):
+        return len(vectorstore)
+    stats = vectorstore.index.describe_index_stats()
+    if vectorstore._namespace is None:
+        return stats.total_vector_count
+    summary = stats.namespaces.get(vectorstore._namespace)
+    return summary.vector_count if summary else 0